@@ -1,12 +1,56 @@
 from flask import Flask, render_template, jsonify, request
+from flask.json.provider import JSONProvider
 from werkzeug.middleware.proxy_fix import ProxyFix
+import orjson
 import random
 import json
+import sys
 import sqlite3
-import datetime
-from contextlib import closing
+import time
+import queue
+import threading
+import atexit
+from contextlib import closing, contextmanager, nullcontext
+
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson for request parsing and jsonify."""
+
+    sort_keys = True
+
+    def options(self, sort_keys=None, indent=None):
+        """Return the orjson option flags for the given serialization settings.
+
+        orjson only supports an indent of 2.
+        """
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys if sort_keys is None else sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent is not None:
+            if indent != 2:
+                raise ValueError("orjson only supports an indent of 2")
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, *, sort_keys=None, indent=None):
+        """Serialize data as JSON. Unsupported keyword arguments raise TypeError."""
+        return orjson.dumps(obj, option=self.options(sort_keys, indent)).decode()
+
+    def loads(self, s):
+        """Deserialize JSON text or UTF-8 bytes."""
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=self.options()),
+            mimetype="application/json"
+        )
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+app.json.sort_keys = False
 
 app.wsgi_app = ProxyFix(
     app.wsgi_app,
@@ -19,6 +63,28 @@ app.wsgi_app = ProxyFix(
 # Database file
 DATABASE = 'quiz_data.db'
 
+# Request threads per worker; keep in sync with Gunicorn's --threads (see README)
+REQUEST_THREADS = 8
+
+# Idle database connections kept open for reuse: one per request thread plus the writer
+POOL_SIZE = REQUEST_THREADS + 1
+_pool = queue.Queue(maxsize=POOL_SIZE)
+
+# Quiz attempts waiting to be written by the background writer thread
+WRITE_QUEUE_SIZE = 1000
+WRITE_BATCH_SIZE = 100
+WRITE_RETRY_MIN_DELAY = 0.1
+WRITE_RETRY_MAX_DELAY = 5.0
+WRITE_RETRY_LIMIT = 8
+WRITER_STOP_TIMEOUT = 30.0
+_write_queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+_writer = None
+_writer_lock = threading.Lock()
+
+# Totals of attempts queued by this process but not yet committed
+_unsaved = {"attempts": 0, "score_sum": 0, "perfect": 0}
+_unsaved_lock = threading.Lock()
+
 # Word groups with US spelling and country-specific equivalents
 WORD_GROUPS = [
     {
@@ -89,12 +155,65 @@ LEVEL_DESCRIPTIONS = {
     3: "Words spelled differently depending on context"
 }
 
+# Level descriptions serialized once, spliced into every quiz response
+LEVEL_DESCRIPTIONS_JSON = orjson.dumps(LEVEL_DESCRIPTIONS, option=orjson.OPT_NON_STR_KEYS)
+
+# Constant start of every quiz response body
+QUIZ_RESPONSE_PREFIX = b'{"levelDescriptions":' + LEVEL_DESCRIPTIONS_JSON + b',"quizData":['
+
+# Country codes used as spelling keys in each word
+COUNTRIES = ("us", "ca", "gb", "au", "nz")
+
+# Lowercased form of every known spelling, built once at import
+LOWERCASE_ANSWERS = {
+    word[country]: sys.intern(word[country].lower())
+    for group in WORD_GROUPS
+    for word in group["words"]
+    for country in COUNTRIES
+}
+
+# Quiz entries for every word, built once at import and shared across requests
+QUIZ_TEMPLATES = [
+    [
+        {
+            "us": word["us"],
+            "ca": word["ca"],
+            "gb": word["gb"],
+            "au": word["au"],
+            "nz": word["nz"],
+            "note": word.get("note", ""),
+            "level": group["level"]
+        }
+        for word in group["words"]
+    ]
+    for group in WORD_GROUPS
+]
+
+# Serialized form of each quiz entry, indexed like QUIZ_TEMPLATES
+QUIZ_TEMPLATES_JSON = [
+    [orjson.dumps(template, option=app.json.options()) for template in templates]
+    for templates in QUIZ_TEMPLATES
+]
+
+# Number of words in each group, for random selection
+_GROUP_SIZES = tuple(len(group["words"]) for group in WORD_GROUPS)
+_randrange = random.randrange
+
+
+def lowercase_answer(answer):
+    """Return the lowercased answer, using the precomputed table when possible."""
+    lowered = LOWERCASE_ANSWERS.get(answer)
+    return lowered if lowered is not None else answer.lower()
+
 
 def init_database():
     """Initialize the SQLite database with required tables."""
     with closing(sqlite3.connect(DATABASE)) as conn:
         cursor = conn.cursor()
         
+        # WAL mode is persistent, so it only needs setting once
+        cursor.execute('PRAGMA journal_mode=WAL')
+        
         # Create quiz_attempts table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS quiz_attempts (
@@ -122,70 +241,313 @@ def init_database():
             )
         ''')
         
+        # Running totals so statistics don't need to scan quiz_attempts
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stats_totals (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                attempts INTEGER NOT NULL,
+                score_sum INTEGER NOT NULL,
+                perfect INTEGER NOT NULL
+            )
+        ''')
+        
+        # Seed the totals row from any existing attempts
+        cursor.execute('''
+            INSERT OR IGNORE INTO stats_totals (id, attempts, score_sum, perfect)
+            SELECT 1,
+                   COUNT(*),
+                   COALESCE(SUM(final_score), 0),
+                   COALESCE(SUM(CASE WHEN final_score = 100 THEN 1 ELSE 0 END), 0)
+            FROM quiz_attempts
+        ''')
+        
         conn.commit()
 
 
 def get_db_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
+    """Get a database connection in autocommit mode.
+
+    Use transaction() to group writes.
+    """
+    conn = sqlite3.connect(DATABASE, check_same_thread=False, isolation_level=None)
     conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA synchronous=NORMAL')
     return conn
 
 
-def get_statistics():
-    """Get quiz statistics from the database."""
-    with closing(get_db_connection()) as conn:
+@contextmanager
+def pool_conn():
+    """Borrow a connection from the pool, opening a new one if none is idle."""
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        # Never hand back a connection that is still holding a transaction
+        if conn.in_transaction:
+            try:
+                conn.execute('ROLLBACK')
+            except sqlite3.Error:
+                conn.close()
+                conn = None
+        if conn is not None:
+            try:
+                _pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+
+@contextmanager
+def transaction(conn, around_commit=nullcontext):
+    """Run a block of writes in one transaction, taking the write lock up front.
+
+    around_commit is a context manager factory entered around the COMMIT.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+        with around_commit():
+            conn.execute('COMMIT')
+    except BaseException:
+        # SQLite may already have rolled back on its own
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+
+
+def save_attempts(conn, attempts, around_commit=nullcontext):
+    """Write a batch of quiz attempts and their answers in one transaction.
+
+    Each attempt is a tuple of (ip_address, timestamp, final_score,
+    correct_count, total_count, answer_rows). around_commit is passed to
+    transaction().
+    """
+    with transaction(conn, around_commit):
         cursor = conn.cursor()
         
-        # Total attempts
-        cursor.execute('SELECT COUNT(*) as total FROM quiz_attempts')
-        total_attempts = cursor.fetchone()['total']
+        for ip_address, timestamp, percentage, correct_count, total_count, answer_rows in attempts:
+            # Insert quiz attempt
+            cursor.execute('''
+                INSERT INTO quiz_attempts (ip_address, timestamp, final_score, correct_count, total_count)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (ip_address, timestamp, percentage, correct_count, total_count))
+            
+            attempt_id = cursor.lastrowid
+            
+            # Insert individual answers
+            cursor.executemany('''
+                INSERT INTO quiz_answers 
+                (attempt_id, word_index, is_level1, country, user_answer, correct_answer, is_correct)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(attempt_id,) + row for row in answer_rows])
+        
+        # Update running statistics totals
+        cursor.execute('''
+            UPDATE stats_totals
+            SET attempts = attempts + ?,
+                score_sum = score_sum + ?,
+                perfect = perfect + ?
+            WHERE id = 1
+        ''', (
+            len(attempts),
+            sum(attempt[2] for attempt in attempts),
+            sum(1 for attempt in attempts if attempt[2] == 100)
+        ))
+
+
+def _is_busy(error):
+    """Return True if a database error means another connection holds the lock."""
+    name = getattr(error, 'sqlite_errorname', '')
+    return name.startswith(('SQLITE_BUSY', 'SQLITE_LOCKED'))
+
+
+def _add_unsaved(attempts, sign):
+    """Add (sign=1) or remove (sign=-1) attempts from the unsaved totals.
+
+    Callers must hold _unsaved_lock.
+    """
+    for attempt in attempts:
+        percentage = attempt[2]
+        _unsaved["attempts"] += sign
+        _unsaved["score_sum"] += sign * percentage
+        if percentage == 100:
+            _unsaved["perfect"] += sign
+
+
+@contextmanager
+def _committing(attempts):
+    """Hold _unsaved_lock across a COMMIT and move the attempts out of the unsaved totals.
+
+    Statistics readers take the same lock, so they never count an attempt
+    both in stats_totals and in the unsaved totals, or in neither.
+    """
+    with _unsaved_lock:
+        yield
+        _add_unsaved(attempts, -1)
+
+
+def _forget_unsaved(attempts):
+    """Remove attempts that the writer has given up on from the unsaved totals."""
+    with _unsaved_lock:
+        _add_unsaved(attempts, -1)
+
+
+def _save_with_retry(attempts):
+    """Save attempts, backing off and retrying while the database is busy or locked.
+
+    Gives up after WRITE_RETRY_LIMIT tries. Any other error is raised at once.
+    """
+    delay = WRITE_RETRY_MIN_DELAY
+    for retry in range(WRITE_RETRY_LIMIT):
+        try:
+            with pool_conn() as conn:
+                save_attempts(conn, attempts, lambda: _committing(attempts))
+            return
+        except sqlite3.OperationalError as error:
+            if not _is_busy(error) or retry == WRITE_RETRY_LIMIT - 1:
+                raise
+            app.logger.warning(
+                'Database busy, retrying %d quiz attempts in %.1fs',
+                len(attempts), delay
+            )
+            time.sleep(delay)
+            delay = min(delay * 2, WRITE_RETRY_MAX_DELAY)
+
+
+def _describe_attempt(attempt):
+    """Summarize an attempt for logging without the client IP or answers."""
+    ip_address, timestamp, percentage, correct_count, total_count, answer_rows = attempt
+    return 'score %d%% (%d/%d correct)' % (percentage, correct_count, total_count)
+
+
+def _write_attempts():
+    """Background writer loop: drain queued attempts and save them in batches."""
+    while True:
+        attempt = _write_queue.get()
+        if attempt is None:
+            return
         
-        # Average score
-        cursor.execute('SELECT AVG(final_score) as avg_score FROM quiz_attempts')
-        avg_result = cursor.fetchone()['avg_score']
-        average_score = round(avg_result) if avg_result else 0
+        batch = [attempt]
+        stop = False
+        while len(batch) < WRITE_BATCH_SIZE:
+            try:
+                attempt = _write_queue.get_nowait()
+            except queue.Empty:
+                break
+            if attempt is None:
+                stop = True
+                break
+            batch.append(attempt)
         
-        # Perfect scores count
-        cursor.execute('SELECT COUNT(*) as perfect FROM quiz_attempts WHERE final_score = 100')
-        perfect_scores = cursor.fetchone()['perfect']
+        try:
+            _save_with_retry(batch)
+        except sqlite3.OperationalError as error:
+            if _is_busy(error):
+                app.logger.error('Database stayed busy, dropping %d quiz attempts', len(batch))
+            else:
+                app.logger.exception('Failed to save %d quiz attempts', len(batch))
+            _forget_unsaved(batch)
+        except Exception:
+            # Save one at a time so a single bad attempt doesn't drop the batch
+            for attempt in batch:
+                try:
+                    _save_with_retry([attempt])
+                except Exception:
+                    app.logger.exception(
+                        'Dropping quiz attempt that cannot be saved: %s',
+                        _describe_attempt(attempt)
+                    )
+                    _forget_unsaved([attempt])
         
-        return {
-            'total_attempts': total_attempts,
-            'average_score': average_score,
-            'perfect_scores': perfect_scores
-        }
+        if stop:
+            return
 
 
-def select_words():
-    """Select one word from each group randomly."""
-    selected_words = []
-    for group_index, group in enumerate(WORD_GROUPS):
-        random_index = random.randint(0, len(group["words"]) - 1)
-        word = group["words"][random_index].copy()
-        word["groupIndex"] = group_index
-        word["level"] = group["level"]
-        selected_words.append(word)
-    return selected_words
-
-
-def generate_quiz_data():
-    """Generate quiz data by selecting words and organizing by level."""
-    selected_words = select_words()
-    quiz_data = []
+def start_writer():
+    """Start the background writer thread if it isn't already running."""
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_write_attempts, name='quiz-writer', daemon=True)
+            _writer.start()
+
+
+def stop_writer():
+    """Flush queued attempts and stop the background writer thread.
+
+    Waits at most WRITER_STOP_TIMEOUT seconds for each step.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is not None and _writer.is_alive():
+            try:
+                _write_queue.put(None, timeout=WRITER_STOP_TIMEOUT)
+            except queue.Full:
+                app.logger.error('Quiz writer queue is full, not waiting for it to drain')
+            else:
+                _writer.join(timeout=WRITER_STOP_TIMEOUT)
+                if _writer.is_alive():
+                    app.logger.error('Quiz writer did not finish within %.0fs', WRITER_STOP_TIMEOUT)
+        _writer = None
+
+
+atexit.register(stop_writer)
+
+
+def queue_attempt(attempt):
+    """Hand an attempt to the background writer and return the updated statistics.
+
+    The statistics include this attempt and any others still waiting to be
+    saved by this process. Raises queue.Full if the writer is too far behind.
+    """
+    start_writer()
+    with _unsaved_lock:
+        with pool_conn() as conn:
+            stats = get_statistics(conn, unsaved=[attempt])
+        _write_queue.put_nowait(attempt)
+        _add_unsaved([attempt], 1)
+    return stats
+
+
+def get_statistics(conn, unsaved=()):
+    """Get quiz statistics using an open database connection.
+
+    The totals also count this process's queued attempts and any extra
+    unsaved attempts passed in. Callers must hold _unsaved_lock.
+    """
+    cursor = conn.cursor()
+    cursor.execute('SELECT attempts, score_sum, perfect FROM stats_totals WHERE id = 1')
+    total_attempts, score_sum, perfect_scores = cursor.fetchone()
     
-    for word in selected_words:
-        quiz_data.append({
-            "us": word["us"],
-            "ca": word["ca"],
-            "gb": word["gb"],
-            "au": word["au"],
-            "nz": word["nz"],
-            "note": word.get("note", ""),
-            "level": word["level"]
-        })
+    total_attempts += _unsaved["attempts"]
+    score_sum += _unsaved["score_sum"]
+    perfect_scores += _unsaved["perfect"]
+    for attempt in unsaved:
+        total_attempts += 1
+        score_sum += attempt[2]
+        if attempt[2] == 100:
+            perfect_scores += 1
+    
+    average_score = round(score_sum / total_attempts) if total_attempts else 0
     
-    return quiz_data
+    return {
+        'total_attempts': total_attempts,
+        'average_score': average_score,
+        'perfect_scores': perfect_scores
+    }
+
+
+def select_words():
+    """Select one word from each group randomly.
+
+    Returns a list of (group index, word index) pairs.
+    """
+    return [
+        (group_index, _randrange(group_size))
+        for group_index, group_size in enumerate(_GROUP_SIZES)
+    ]
 
 
 @app.route('/')
@@ -196,12 +558,21 @@ def index():
 
 @app.route('/api/quiz', methods=['GET'])
 def get_quiz():
-    """Generate and return quiz data."""
-    quiz_data = generate_quiz_data()
-    return jsonify({
-        "quizData": quiz_data,
-        "levelDescriptions": LEVEL_DESCRIPTIONS
-    })
+    """Generate and return quiz data.
+
+    The body is assembled from pre-serialized entries. The word selection
+    is random, so the response must not be cached.
+    """
+    quiz_json = b','.join(
+        QUIZ_TEMPLATES_JSON[group_index][word_index]
+        for group_index, word_index in select_words()
+    )
+    response = app.response_class(
+        QUIZ_RESPONSE_PREFIX + quiz_json + b']}',
+        mimetype="application/json"
+    )
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 
 @app.route('/api/check', methods=['POST'])
@@ -211,19 +582,18 @@ def check_answers():
     quiz_data = data.get("quizData", [])
     answers = data.get("answers", [])
     
-    # Get client IP address
+    # Client IP address, resolved from X-Forwarded-For by ProxyFix
     ip_address = request.remote_addr
-    if request.headers.get('X-Forwarded-For'):
-        ip_address = request.headers.get('X-Forwarded-For').split(',')[0].strip()
     
     results = []
     correct_count = 0
     total_count = 0
     
-    for i, answer_data in enumerate(answers):
+    for answer_data in answers:
         word_index = answer_data["wordIndex"]
         is_level1 = answer_data.get("isLevel1", False)
-        user_answer = answer_data.get("answer", "").strip().lower()
+        stripped_answer = answer_data.get("answer", "").strip()
+        user_answer = stripped_answer.lower()
         
         word = quiz_data[word_index]
         result = {
@@ -231,7 +601,7 @@ def check_answers():
             "isLevel1": is_level1,
             "correct": False,
             "correctAnswer": None,
-            "userAnswer": answer_data.get("answer", "").strip()
+            "userAnswer": stripped_answer
         }
         
         if is_level1:
@@ -240,19 +610,19 @@ def check_answers():
             result["correctAnswer"] = correct_answer
             
             total_count += 1
-            if user_answer == correct_answer.lower():
+            if user_answer == lowercase_answer(correct_answer):
                 result["correct"] = True
                 correct_count += 1
         else:
             # For other levels, check each country separately
             country = answer_data.get("country")
-            if country and country in word:
-                correct_answer = word[country]
+            correct_answer = word.get(country)
+            if correct_answer is not None:
                 result["correctAnswer"] = correct_answer
                 result["country"] = country
                 
                 total_count += 1
-                if user_answer == correct_answer.lower():
+                if user_answer == lowercase_answer(correct_answer):
                     result["correct"] = True
                     correct_count += 1
         
@@ -260,39 +630,26 @@ def check_answers():
     
     percentage = round((correct_count / total_count * 100)) if total_count > 0 else 0
     
-    # Save to database
-    timestamp = datetime.datetime.now().isoformat()
-    with closing(get_db_connection()) as conn:
-        cursor = conn.cursor()
-        
-        # Insert quiz attempt
-        cursor.execute('''
-            INSERT INTO quiz_attempts (ip_address, timestamp, final_score, correct_count, total_count)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (ip_address, timestamp, percentage, correct_count, total_count))
-        
-        attempt_id = cursor.lastrowid
-        
-        # Insert individual answers
-        for result in results:
-            cursor.execute('''
-                INSERT INTO quiz_answers 
-                (attempt_id, word_index, is_level1, country, user_answer, correct_answer, is_correct)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                attempt_id,
-                result["wordIndex"],
-                1 if result["isLevel1"] else 0,
-                result.get("country"),
-                result["userAnswer"],
-                result["correctAnswer"],
-                1 if result["correct"] else 0
-            ))
-        
-        conn.commit()
+    # Queue the attempt for the background writer
+    answer_rows = [
+        (
+            result["wordIndex"],
+            1 if result["isLevel1"] else 0,
+            result.get("country"),
+            result["userAnswer"],
+            result["correctAnswer"],
+            1 if result["correct"] else 0
+        )
+        for result in results
+    ]
     
-    # Get statistics
-    stats = get_statistics()
+    # Record when the attempt was submitted, not when the writer saves it
+    timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+    try:
+        stats = queue_attempt((ip_address, timestamp, percentage, correct_count, total_count, answer_rows))
+    except queue.Full:
+        # The writer is behind, most likely on a locked database
+        return jsonify({"error": "Too many submissions right now, please try again."}), 503
     
     return jsonify({
         "results": results,
@@ -308,5 +665,5 @@ def check_answers():
 if __name__ == '__main__':
     # Initialize database on startup
     init_database()
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(host='0.0.0.0', port=5000)
 
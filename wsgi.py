@@ -0,0 +1,4 @@
+from main import app, init_database
+
+# Initialize database on worker startup
+init_database()